@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from loguru import logger
 from app.schemas.events import EventBatchRequest, EventBatchResponse
 from app.services.workflow_processor import WorkflowProcessor
@@ -8,12 +8,25 @@ from typing import List
 router = APIRouter()
 
 
+def get_workflow_processor(http_request: Request) -> WorkflowProcessor:
+    """Shared processor (created at startup, or here on first use); its clients and caches outlive requests"""
+    state = http_request.app.state
+    if getattr(state, "workflow_processor", None) is None:
+        try:
+            state.workflow_processor = WorkflowProcessor()
+        except Exception as e:
+            logger.error(f"Failed to initialize workflow processor: {str(e)}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error")
+    return state.workflow_processor
+
+
 @router.post("/interactions", response_model=EventBatchResponse)
-async def receive_events(request: EventBatchRequest):
+async def receive_events(
+    request: EventBatchRequest, workflow_processor: WorkflowProcessor = Depends(get_workflow_processor)
+):
     """Process interaction events and generate workflows (stored as JSON files)"""
     try:
         # Generate workflows from the processed events
-        workflow_processor = WorkflowProcessor()
         workflows: List[WorkflowSchema] = await workflow_processor.process_events_for_workflows(request.events)
 
         return EventBatchResponse(
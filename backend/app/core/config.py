@@ -1,5 +1,6 @@
+from functools import cached_property
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import FrozenSet, List, Optional
 
 
 class Settings(BaseSettings):
@@ -7,19 +8,40 @@ class Settings(BaseSettings):
     api_host: str = "0.0.0.0"
     api_port: int = 3000
     api_prefix: str = "/api"
+    api_reload: bool = False
+
+    # Server tuning (max requests only applies under a process manager that restarts workers)
+    api_backlog: int = 4096
+    api_keep_alive_timeout: int = 15
+    api_limit_concurrency: Optional[int] = 1024
+    api_max_requests: int = 10000
+    api_max_requests_jitter: int = 1000
 
     # CORS Configuration
     cors_origins: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
+    cors_allow_methods: List[str] = ["GET", "POST", "OPTIONS"]
+    cors_allow_headers: List[str] = ["Authorization", "Content-Type", "X-Requested-With"]
 
     # Logging
     log_level: str = "INFO"
+    log_json: bool = False
 
     # Application
     app_name: str = "Workflow Event Processor"
     app_version: str = "1.0.0"
+    enable_docs: bool = True
 
     # LLM Configuration
     openai_api_key: str = ""
+    # Enforced per process: under Gunicorn each worker gets the full budget, so set these to the account
+    # limit divided by the worker count (WEB_CONCURRENCY)
+    openai_concurrency: int = 8
+    openai_requests_per_minute: int = 500
+
+    @cached_property
+    def cors_origins_set(self) -> FrozenSet[str]:
+        """Allowed CORS origins as a set for O(1) membership checks"""
+        return frozenset(self.cors_origins)
 
     class Config:
         env_file = ".env"
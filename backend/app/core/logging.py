@@ -0,0 +1,20 @@
+import sys
+
+from loguru import logger
+
+from app.core.config import settings
+
+
+def configure_logging():
+    """Route loguru through one queued stderr sink so logging never blocks the event loop"""
+    logger.remove()
+    # enqueue hands records to a background writer (and keeps lines intact across Gunicorn workers);
+    # records below the configured level are dropped before they are formatted
+    logger.add(
+        sys.stderr,
+        level=settings.log_level.upper(),
+        enqueue=True,
+        backtrace=False,
+        diagnose=False,
+        serialize=settings.log_json,
+    )
@@ -0,0 +1,11 @@
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+from app.core.config import settings
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """Gunicorn worker that applies the API server settings Gunicorn itself has no option for"""
+
+    # Gunicorn passes bind, backlog, keepalive and max_requests through; the concurrency cap has to be set here,
+    # otherwise Gunicorn workers run without it
+    CONFIG_KWARGS = {**BaseUvicornWorker.CONFIG_KWARGS, "limit_concurrency": settings.api_limit_concurrency}
@@ -0,0 +1,13 @@
+from starlette.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp
+
+
+class FastCORSMiddleware(CORSMiddleware):
+    """CORS middleware with allowed origins, methods and headers frozen into sets for O(1) request checks"""
+
+    def __init__(self, app: ASGIApp, **kwargs):
+        # Starlette already pre-joins the response header values; only the membership checks need normalizing
+        super().__init__(app, **kwargs)
+        self.allow_origins = frozenset(self.allow_origins)
+        self.allow_methods = frozenset(self.allow_methods)
+        self.allow_headers = frozenset(self.allow_headers)
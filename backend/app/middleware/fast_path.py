@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+RawHeaders = List[Tuple[bytes, bytes]]
+# (headers, body, etag) for one encoding of a response
+Representation = Tuple[RawHeaders, bytes, Optional[str]]
+
+
+class FastPathMiddleware:
+    """Serve fixed JSON bodies for a few GET paths before any other middleware or routing runs"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        routes: Dict[str, bytes],
+        cache_paths: Iterable[str] = (),
+        max_age: int = 60,
+        gzip_minimum_size: int = 1024,
+        allow_origins: Iterable[str] = (),
+        allow_credentials: bool = False,
+    ):
+        self.app = app
+        cache_paths = frozenset(cache_paths)
+        self.max_age = max_age
+        # Every representation is built once; larger bodies are also pre-compressed, since these responses
+        # never pass through GZipMiddleware
+        self.responses: Dict[str, Tuple[Representation, Optional[Representation]]] = {}
+        for path, body in routes.items():
+            cacheable = path in cache_paths
+            compressible = len(body) >= gzip_minimum_size
+            plain = self._representation(body, cacheable, compressible, encoding=None)
+            compressed = None
+            if compressible:
+                compressed = self._representation(
+                    gzip.compress(body, compresslevel=9, mtime=0), cacheable, compressible, encoding=b"gzip"
+                )
+            self.responses[path] = (plain, compressed)
+
+        # These responses bypass CORSMiddleware, so they add the same simple-response headers it would
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_all_origins = "*" in self.allow_origins
+        self.allow_credentials = allow_credentials
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            response = self.responses.get(scope["path"])
+            if response is not None:
+                plain, compressed = response
+                origin = if_none_match = None
+                accepts_gzip = False
+                for name, value in scope["headers"]:
+                    if name == b"origin":
+                        origin = value
+                    elif name == b"if-none-match":
+                        if_none_match = value
+                    elif name == b"accept-encoding":
+                        accepts_gzip = b"gzip" in value
+                headers, body, etag = compressed if compressed is not None and accepts_gzip else plain
+                cors_headers = self._cors_headers(origin)
+
+                if etag is not None and if_none_match is not None and self._etag_matches(if_none_match, etag):
+                    await send({"type": "http.response.start", "status": 304, "headers": headers[2:] + cors_headers})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                # A fresh header list per request, so outer layers that append headers never mutate the cached one
+                await send({"type": "http.response.start", "status": 200, "headers": headers + cors_headers})
+                await send({"type": "http.response.body", "body": body if scope["method"] == "GET" else b""})
+                return
+
+        await self.app(scope, receive, send)
+
+    def _representation(
+        self, body: bytes, cacheable: bool, compressible: bool, encoding: Optional[bytes]
+    ) -> Representation:
+        """Raw headers, body and ETag for one encoding of a fixed response"""
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]
+        etag = None
+        if cacheable:
+            # Bodies only change on deploy, so a strong ETag lets repeat clients revalidate with a bodiless 304;
+            # each encoding is a different representation and gets its own tag
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            headers += [
+                (b"etag", etag.encode("latin-1")),
+                (b"cache-control", f"public, max-age={self.max_age}".encode()),
+            ]
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding))
+        if compressible:
+            headers.append((b"vary", b"Accept-Encoding"))
+        return headers, body, etag
+
+    def _cors_headers(self, origin: Optional[bytes]) -> RawHeaders:
+        """CORS headers for a simple response, matching CORSMiddleware's behaviour"""
+        if origin is None:
+            return [(b"vary", b"Origin")]
+
+        headers = []
+        if self.allow_credentials:
+            headers.append((b"access-control-allow-credentials", b"true"))
+        if self.allow_all_origins and not self.allow_credentials:
+            headers.append((b"access-control-allow-origin", b"*"))
+        elif self.allow_all_origins or origin.decode("latin-1") in self.allow_origins:
+            headers.append((b"access-control-allow-origin", origin))
+        headers.append((b"vary", b"Origin"))
+        return headers
+
+    @staticmethod
+    def _etag_matches(if_none_match: bytes, etag: str) -> bool:
+        """Check the request's If-None-Match header against the response ETag"""
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.decode("latin-1").split(",")}
+        return etag in tags or "*" in tags
@@ -1,4 +1,6 @@
+from functools import cached_property
 from typing import Optional, List, Dict, Any
+from urllib.parse import urlparse
 from pydantic import BaseModel, Field
 
 
@@ -15,17 +17,15 @@ class BrowserEvent(BaseModel):
     payload: Optional[Dict[str, Any]] = Field(None, description="Event-specific data")
 
     # Computed fields
-    @property
+    @cached_property
     def domain(self) -> Optional[str]:
-        """Extract domain from URL"""
+        """Extract domain from URL (parsed once per event)"""
         if not self.url:
             return None
         try:
-            from urllib.parse import urlparse
-
             parsed = urlparse(self.url)
             return parsed.netloc.lower()
-        except:
+        except ValueError:
             return None
 
     @property
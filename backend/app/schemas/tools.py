@@ -1,5 +1,6 @@
+import sys
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class ToolDefinition(BaseModel):
@@ -10,6 +11,12 @@ class ToolDefinition(BaseModel):
     description: str = Field(..., description="Tool description")
     input_schema: Dict[str, Any] = Field(..., description="JSON schema for input parameters")
 
+    @field_validator("name")
+    @classmethod
+    def _intern_name(cls, name: str) -> str:
+        """Intern tool names so lookups against workflow step tools compare by identity first"""
+        return sys.intern(name)
+
     @property
     def required_parameters(self) -> List[str]:
         """Get list of required parameter names"""
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field
+import sys
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 
@@ -16,6 +17,18 @@ class WorkflowStepSchema(BaseModel):
     context_selector: Optional[str] = Field(None, description="CSS selector (for browser_context steps)")
     context_description: Optional[str] = Field(None, description="What to extract (for browser_context steps)")
 
+    @field_validator("step_type")
+    @classmethod
+    def _intern_step_type(cls, step_type: str) -> str:
+        """Intern step types; they are compared and hashed throughout validation and deduplication"""
+        return sys.intern(step_type)
+
+    @field_validator("tools")
+    @classmethod
+    def _intern_tools(cls, tools: Optional[List[str]]) -> Optional[List[str]]:
+        """Intern tool names so set and dict lookups against the tool catalog compare by identity first"""
+        return [sys.intern(tool) for tool in tools] if tools is not None else None
+
 
 class WorkflowSchema(BaseModel):
     """Schema for complete workflows"""
@@ -31,6 +44,13 @@ class WorkflowSchema(BaseModel):
     created_at: Optional[datetime] = Field(None, description="Creation timestamp")
     updated_at: Optional[datetime] = Field(None, description="Last update timestamp")
 
+    # Memoized by WorkflowDeduplicator when choosing between duplicates
+    _quality_score: Optional[float] = PrivateAttr(default=None)
+    # Memoized by WorkflowDeduplicator: this workflow's serialized prompt entry, minus its index
+    _prompt_fragment: Optional[bytes] = PrivateAttr(default=None)
+    # Memoized by WorkflowDeduplicator: canonical content hash
+    _content_digest: Optional[str] = PrivateAttr(default=None)
+
 
 class WorkflowGenerationRequest(BaseModel):
     """Request schema for workflow generation"""
@@ -6,7 +6,7 @@ from app.schemas.page_sessions import PageSession, PageSegment
 from app.schemas.tools import ToolsCatalog
 from app.schemas.workflows import WorkflowSchema, WorkflowStepSchema
 from app.services.utils import load_prompt
-from openai import OpenAI
+from openai import AsyncOpenAI
 from app.core.config import settings
 
 
@@ -14,10 +14,14 @@ class GeneralizationService:
     """Service for generalizing workflows to make them reusable and not instance-bound"""
 
     def __init__(self):
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        # Async client so LLM calls don't block the event loop while a request is being processed
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.llm_available = bool(settings.openai_api_key)
 
+    async def close(self):
+        """Close the OpenAI client's connection pool"""
+        await self.client.close()
+
     async def generalize_workflow(
         self, page_segment: PageSegment, tools_catalog: ToolsCatalog
     ) -> Optional[WorkflowSchema]:
@@ -97,7 +101,7 @@ class GeneralizationService:
                 user_actions=user_actions,
                 tools_catalog=tools_catalog,
             )
-            return await self._parse_llm_workflow_response(llm_response)
+            return self._parse_llm_workflow_response(llm_response)
         except Exception as e:
             logger.error(f"Failed to generate workflow with LLM: {str(e)}")
             return None
@@ -128,7 +132,7 @@ class GeneralizationService:
         )
 
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-5-mini-2025-08-07",
                 messages=[
                     {
@@ -145,7 +149,7 @@ class GeneralizationService:
             logger.error(f"OpenAI API call failed for workflow generation: {str(e)}")
             raise
 
-    async def _parse_llm_workflow_response(self, llm_response: str) -> Optional[Dict[str, Any]]:
+    def _parse_llm_workflow_response(self, llm_response: str) -> Optional[Dict[str, Any]]:
         """Parse LLM response into workflow data"""
 
         try:
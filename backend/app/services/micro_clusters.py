@@ -0,0 +1,53 @@
+from dataclasses import dataclass, field
+from typing import Dict, Generic, Hashable, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class MicroCluster(Generic[T]):
+    """Items whose token sequences all closely match the sequence that seeded the cluster"""
+
+    key: Hashable
+    sequence: Tuple[str, ...]
+    members: List[T] = field(default_factory=list)
+
+
+def sequence_similarity(a: Sequence[str], b: Sequence[str]) -> float:
+    """LCS-based similarity in [0, 1]: 2 * |LCS| / (|a| + |b|)"""
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+
+    # Two-row dynamic programming table for the LCS length
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+
+    return 2 * previous[-1] / (len(a) + len(b))
+
+
+def cluster_sequences(items: Sequence[Tuple[Hashable, Tuple[str, ...], T]], threshold: float) -> List[MicroCluster[T]]:
+    """Single pass: join the first same-key cluster whose seed is similar enough, otherwise seed a new one"""
+    clusters: List[MicroCluster[T]] = []
+    clusters_by_key: Dict[Hashable, List[MicroCluster[T]]] = {}
+
+    for key, sequence, item in items:
+        for cluster in clusters_by_key.get(key, []):
+            # The LCS is at most the shorter sequence, which rules out most pairs without the DP
+            shorter, longer = sorted((len(sequence), len(cluster.sequence)))
+            if 2 * shorter < threshold * (shorter + longer):
+                continue
+            if sequence_similarity(sequence, cluster.sequence) >= threshold:
+                cluster.members.append(item)
+                break
+        else:
+            cluster = MicroCluster(key=key, sequence=sequence, members=[item])
+            clusters.append(cluster)
+            clusters_by_key.setdefault(key, []).append(cluster)
+
+    return clusters
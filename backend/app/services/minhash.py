@@ -0,0 +1,46 @@
+import zlib
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def minhash_signatures(shingle_sets: List[Set[str]], num_perm: int = 128, seed: int = 1) -> np.ndarray:
+    """MinHash signature per shingle set, shape (len(shingle_sets), num_perm)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, (1 << 61) - 1, num_perm, dtype=np.uint64)
+    b = rng.integers(0, (1 << 61) - 1, num_perm, dtype=np.uint64)
+
+    signatures = np.full((len(shingle_sets), num_perm), _MAX_HASH, dtype=np.uint64)
+    for row, shingles in enumerate(shingle_sets):
+        if not shingles:
+            continue
+        hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.uint64)
+        # Universal hashing (a*x + b) mod p for all permutations at once; uint64 overflow wraps like datasketch
+        permuted = ((hashes[:, None] * a + b) % _MERSENNE_PRIME) & _MAX_HASH
+        signatures[row] = permuted.min(axis=0)
+    return signatures
+
+
+def lsh_candidate_pairs(query: np.ndarray, index: np.ndarray, bands: int = 32) -> Set[Tuple[int, int]]:
+    """(query_row, index_row) pairs whose signatures collide in at least one LSH band"""
+    rows_per_band = query.shape[1] // bands
+    pairs: Set[Tuple[int, int]] = set()
+    for band in range(bands):
+        columns = slice(band * rows_per_band, (band + 1) * rows_per_band)
+        buckets: Dict[bytes, List[int]] = {}
+        for j, band_signature in enumerate(index[:, columns]):
+            buckets.setdefault(band_signature.tobytes(), []).append(j)
+        for i, band_signature in enumerate(query[:, columns]):
+            for j in buckets.get(band_signature.tobytes(), ()):
+                pairs.add((i, j))
+    return pairs
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Exact Jaccard similarity of two sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
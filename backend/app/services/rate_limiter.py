@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+
+class RequestRateLimiter:
+    """Async token bucket that keeps outgoing requests under a requests-per-minute budget"""
+
+    def __init__(self, requests_per_minute: int):
+        # Bursts are capped at about one second's budget; a full minute's capacity would let roughly twice
+        # the budget out in the first minute
+        self.capacity = max(1, requests_per_minute // 60)
+        self.rate = requests_per_minute / 60.0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request may be sent; a non-positive budget disables limiting"""
+        if self.rate <= 0:
+            return
+
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
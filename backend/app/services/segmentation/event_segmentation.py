@@ -1,9 +1,11 @@
-from typing import List, Optional
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
 from loguru import logger
 from app.schemas.browser_events import BrowserEvent
 from app.schemas.page_sessions import PageSession, PageSegment
 from app.services.segmentation.page_service import PageService
 from app.services.segmentation.intent_classification_service import IntentClassificationService
+from app.core.config import settings
 
 
 class EventSegmentationService:
@@ -15,37 +17,44 @@ class EventSegmentationService:
 
         self.min_segment_duration_ms = 2000  # 2 seconds minimum
         self.max_segment_duration_ms = 600000  # 10 minutes maximum
+        # Bounds concurrent intent-classification LLM calls
+        self._classification_semaphore = asyncio.Semaphore(settings.openai_concurrency)
 
-    async def generate_candidate_workflows(self, events: List[BrowserEvent]) -> List[PageSegment]:
-        """Hierarchical segmentation: events -> page sessions -> candidate workflows (multi-page)"""
+    async def close(self):
+        """Release network resources held by the intent classifier"""
+        await self.intent_classifier.close()
+
+    async def iter_candidate_workflows(self, events: List[BrowserEvent]) -> AsyncIterator[Tuple[int, PageSegment]]:
+        """Yield (segment position, candidate workflow) as soon as each segment has been classified"""
         if not events:
-            return []
+            return
 
         # Step 1: Convert events to page-level summaries
-        page_sessions: List[PageSession] = await self.page_service.group_events_into_page_sessions(events)
-        # Step 2: Segment page sessions into candidate workflows (multi-page segments)
-        candidate_workflows: List[PageSegment] = await self._process_page_sessions(page_sessions)
-
-        return candidate_workflows
-
-    async def _process_page_sessions(self, page_sessions: List[PageSession]) -> List[PageSegment]:
-        """Segment page sessions into candidate workflows (multi-page segments)"""
+        page_sessions: List[PageSession] = self.page_service.group_events_into_page_sessions(events)
         if not page_sessions:
-            return []
-
-        # Use page-level breakpoints
-        page_segments: List[List[PageSession]] = await self._find_page_breakpoints(page_sessions)
-
-        # Process page segments and classify them
-        candidate_workflows = []
-        for page_segment in page_segments:
-            workflow_segment = await self._process_page_segment(page_segment)
-            if workflow_segment:
-                candidate_workflows.append(workflow_segment)
-
-        return candidate_workflows
-
-    async def _find_page_breakpoints(self, page_sessions: List[PageSession]) -> List[List[PageSession]]:
+            return
+
+        # Step 2: Segment page sessions at page-level breakpoints (multi-page segments)
+        page_segments: List[List[PageSession]] = self._find_page_breakpoints(page_sessions)
+
+        # Step 3: Classify all segments concurrently, yielding each in completion order
+        async def classify(position: int, page_segment: List[PageSession]) -> Tuple[int, Optional[PageSegment]]:
+            return position, await self._process_page_segment(page_segment)
+
+        tasks = [
+            asyncio.create_task(classify(position, page_segment)) for position, page_segment in enumerate(page_segments)
+        ]
+        try:
+            for classified in asyncio.as_completed(tasks):
+                position, workflow_segment = await classified
+                if workflow_segment:
+                    yield position, workflow_segment
+        finally:
+            # Stop classifications still in flight if the consumer fails, is cancelled or stops early
+            for task in tasks:
+                task.cancel()
+
+    def _find_page_breakpoints(self, page_sessions: List[PageSession]) -> List[List[PageSession]]:
         """Detect breakpoints between page sessions"""
         segments = []
         current_segment = []
@@ -102,7 +111,8 @@ class EventSegmentationService:
             return None
 
         # Classify the segment using intent classifier
-        segment_type, tool_categories = await self.intent_classifier.classify_segment_intent(page_segment)
+        async with self._classification_semaphore:
+            segment_type, tool_categories = await self.intent_classifier.classify_segment_intent(page_segment)
 
         # Skip segments that don't seem meaningful
         if segment_type == "unknown":
@@ -4,7 +4,7 @@ import json
 from app.schemas.page_sessions import PageSession
 from app.core.config import settings
 from app.services.utils import load_prompt
-from openai import OpenAI
+from openai import AsyncOpenAI
 from app.services.tool_loader import ToolLoader
 
 
@@ -12,11 +12,15 @@ class IntentClassificationService:
     """Service for classifying event segments using LLM analysis"""
 
     def __init__(self):
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        # Async client so LLM calls don't block the event loop while a request is being processed
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
         self.llm_available = bool(settings.openai_api_key)
         self.tool_loader = ToolLoader()
 
+    async def close(self):
+        """Close the OpenAI client's connection pool"""
+        await self.client.close()
+
     def _parse_intent_response(self, response_text: str) -> Tuple[str, List[str]]:
         """Parse LLM response to extract intent and tool categories"""
         try:
@@ -95,7 +99,7 @@ class IntentClassificationService:
         )
 
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-5-mini-2025-08-07",
                 messages=[
                     {
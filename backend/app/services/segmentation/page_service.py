@@ -1,10 +1,15 @@
 from typing import List, Dict, Optional
 from loguru import logger
 from collections import defaultdict
+import numpy as np
 
 from app.schemas.browser_events import BrowserEvent
 from app.schemas.page_sessions import PageSession
 
+# Event type codes for vectorized denoising; focus and blur must stay the two highest codes
+CLICK, FOCUS, BLUR = 1, 2, 3
+_EVENT_TYPE_CODES = {"click": CLICK, "focus": FOCUS, "blur": BLUR}
+
 
 class PageService:
     """Summarizes page-level activities into clean summaries"""
@@ -17,7 +22,7 @@ class PageService:
         self.rapid_click_threshold_ms = 200  # Events within 200ms are rapid
         self.accidental_event_threshold_ms = 100  # Events under 100ms are accidental
 
-    async def group_events_into_page_sessions(self, events: List[BrowserEvent]) -> List[PageSession]:
+    def group_events_into_page_sessions(self, events: List[BrowserEvent]) -> List[PageSession]:
         """Convert events into page-level summaries"""
         if not events:
             return []
@@ -26,7 +31,7 @@ class PageService:
 
         summaries: List[PageSession] = []
         for _, page_events in page_groups.items():
-            processed_page_session: Optional[PageSession] = await self._create_page_summary(page_events)
+            processed_page_session: Optional[PageSession] = self._create_page_summary(page_events)
 
             if processed_page_session:
                 summaries.append(processed_page_session)
@@ -53,74 +58,37 @@ class PageService:
         if len(events) < 2:
             return events
 
-        denoised: List[BrowserEvent] = []
-
-        i = 0
-        while i < len(events):
-            current_event = events[i]
-
-            # Skip rapid clicks on same element
-            if self._is_rapid_click(current_event, events, i):
-                i += 1
-                continue
-
-            # Skip accidental events (very short duration)
-            if self._is_accidental_event(current_event, events, i):
-                i += 1
-                continue
-
-            # Skip focus/blur noise
-            if self._is_focus_blur_noise(current_event, events, i):
-                i += 1
-                continue
-
-            denoised.append(current_event)
-            i += 1
-
-        return denoised
-
-    def _is_rapid_click(self, event: BrowserEvent, events: List[BrowserEvent], index: int) -> bool:
-        """Check if this is a rapid click on the same element"""
-        if event.type != "click" or index == 0:
-            return False
-
-        previous_event = events[index - 1]
-        if previous_event.type != "click":
-            return False
-
-        time_gap = event.timestamp - previous_event.timestamp
-        if time_gap > self.rapid_click_threshold_ms:
-            return False
-
-        # Same element (same URL + tab)
-        return event.url == previous_event.url and event.tab_id == previous_event.tab_id
-
-    def _is_accidental_event(self, event: BrowserEvent, events: List[BrowserEvent], index: int) -> bool:
-        """Check if the gap between the current and previous event is less than the accidental event threshold"""
-        if index == 0:
-            return False
-
-        previous_event = events[index - 1]
-        time_gap = event.timestamp - previous_event.timestamp
-
-        return time_gap < self.accidental_event_threshold_ms
+        count = len(events)
+        timestamps = np.fromiter((event.timestamp for event in events), dtype=np.int64, count=count)
+        types = np.fromiter((_EVENT_TYPE_CODES.get(event.type, 0) for event in events), dtype=np.int8, count=count)
+        page_ids: Dict[tuple, int] = {}
+        pages = np.fromiter(
+            (page_ids.setdefault((event.url, event.tab_id), len(page_ids)) for event in events),
+            dtype=np.int32,
+            count=count,
+        )
 
-    def _is_focus_blur_noise(self, event: BrowserEvent, events: List[BrowserEvent], index: int) -> bool:
-        """Check if the current event is a focus/blur event and the previous event is not the same type"""
-        if event.type not in ["focus", "blur"]:
-            return False
+        # Every rule compares an event with the one before it, so each is a single vectorized pass
+        gaps = np.diff(timestamps)
+        current, previous = types[1:], types[:-1]
 
-        # Look for rapid focus/blur pairs
-        if index > 0:
-            prev_event = events[index - 1]
-            if prev_event.type in ["focus", "blur"] and event.type != prev_event.type:
-                time_gap = event.timestamp - prev_event.timestamp
-                if time_gap < 500:  # 500ms threshold for focus/blur noise
-                    return True
+        # Rapid clicks on the same element (same URL + tab)
+        rapid_click = (
+            (current == CLICK)
+            & (previous == CLICK)
+            & (gaps <= self.rapid_click_threshold_ms)
+            & (pages[1:] == pages[:-1])
+        )
+        # Accidental events (very short gap to the previous event)
+        accidental = gaps < self.accidental_event_threshold_ms
+        # Rapid focus/blur pairs
+        focus_blur = (current >= FOCUS) & (previous >= FOCUS) & (current != previous) & (gaps < 500)
 
-        return False
+        keep = np.ones(count, dtype=bool)
+        keep[1:] = ~(rapid_click | accidental | focus_blur)
+        return [event for event, kept in zip(events, keep.tolist()) if kept]
 
-    async def _create_page_summary(self, events: List[BrowserEvent]) -> Optional[PageSession]:
+    def _create_page_summary(self, events: List[BrowserEvent]) -> Optional[PageSession]:
         """Create a summary of activities on a single page"""
 
         if not events:
@@ -1,6 +1,6 @@
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional
 from app.schemas.tools import ToolDefinition, ToolsCatalog
 from loguru import logger
 
@@ -11,6 +11,8 @@ class ToolLoader:
     def __init__(self, tools_dump_path: str = "tools-dump"):
         self.tools_dump_path = Path(tools_dump_path)
         self._tools_cache: Optional[ToolsCatalog] = None
+        # Segments mostly share a few category combinations, so catalogs are cached per combination
+        self._category_cache: Dict[FrozenSet[str], ToolsCatalog] = {}
 
     def load_all_tools(self) -> ToolsCatalog:
         """Load all tools from the tools-dump directory"""
@@ -45,10 +47,15 @@ class ToolLoader:
             logger.debug("No categories specified, returning empty catalog")
             return ToolsCatalog(tools=[])
 
+        cache_key = frozenset(categories)
+        if cache_key in self._category_cache:
+            return self._category_cache[cache_key]
+
         logger.info(f"Loading tools from categories: {categories}")
         all_tools = []
 
-        for category in categories:
+        # Sorted so the catalog doesn't depend on the order categories were listed in
+        for category in sorted(cache_key):
             tool_file = self.tools_dump_path / f"{category}.txt"
             if tool_file.exists():
                 try:
@@ -60,8 +67,9 @@ class ToolLoader:
             else:
                 logger.warning(f"Tool category file not found: {tool_file}")
 
-        logger.info(f"Successfully loaded {len(all_tools)} tools from {len(categories)} categories")
-        return ToolsCatalog(tools=all_tools)
+        logger.info(f"Successfully loaded {len(all_tools)} tools from {len(cache_key)} categories")
+        self._category_cache[cache_key] = ToolsCatalog(tools=all_tools)
+        return self._category_cache[cache_key]
 
     def _load_tools_from_file(self, file_path: Path) -> List[ToolDefinition]:
         """Load tools from a single file"""
@@ -127,6 +135,7 @@ class ToolLoader:
     def refresh_cache(self):
         """Clear the tools cache to force reload"""
         self._tools_cache = None
+        self._category_cache.clear()
         logger.info("Tools cache cleared")
 
     def get_available_tool_categories(self) -> List[str]:
@@ -1,22 +1,120 @@
-from typing import Dict, Any
+import json
+import os
+import re
+import string
+import time
+import uuid
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, Any, List, Tuple
 from loguru import logger
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # optional speedup, fall back to the stdlib json module
+    orjson = None
 
-def load_prompt(prompt_file: str, variables: Dict[str, Any] = {}) -> str:
-    """Load a prompt from file and substitute variables"""
+# ASCII names are sanitized with one C-level translate; characters outside the table fall back to isalnum()
+_VALID_NAME_CHARS = frozenset(string.ascii_letters + string.digits + ".-_")
+_SANITIZE_TABLE = str.maketrans({chr(i): "_" for i in range(128) if chr(i) not in _VALID_NAME_CHARS})
+_COLLAPSE_UNDERSCORES = re.compile(r"_+")
+
+
+@lru_cache(maxsize=16)
+def _read_prompt_template(prompt_file: str) -> str:
+    """Read a prompt template once; templates only change on deploy"""
     prompt_path = Path("prompts") / prompt_file
 
     if not prompt_path.exists():
         raise FileNotFoundError(f"Prompt file not found: {prompt_path}")
 
     with open(prompt_path, "r", encoding="utf-8") as f:
-        prompt_template = f.read()
+        return f.read()
+
+
+def load_prompt(prompt_file: str, variables: Dict[str, Any] = {}) -> str:
+    """Load a prompt from file and substitute variables"""
+    prompt_template = _read_prompt_template(prompt_file)
 
     if variables:
         try:
-            return prompt_template.format(**variables)
+            return prompt_template.format_map(variables)
         except KeyError as e:
             raise ValueError(f"Missing required variable: {e}")
 
     return prompt_template
+
+
+@lru_cache(maxsize=32)
+def prompt_parts(prompt_file: str, placeholder: str, **variables: Any) -> Tuple[str, ...]:
+    """Render a prompt with all variables but one, split around it; callers build it with value.join(parts)"""
+    sentinel = f"\x00{placeholder}\x00"
+    return tuple(load_prompt(prompt_file, {**variables, placeholder: sentinel}).split(sentinel))
+
+
+def load_json_bytes(data: bytes) -> Any:
+    """Parse JSON from raw bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_json_bytes(data: Any, indent: bool = False) -> bytes:
+    """Serialize JSON to UTF-8 bytes, using orjson when available"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def step_tool_names(step: Dict) -> List[str]:
+    """Get tool names from an exported step (the exporter nests them under tools.tool_names)"""
+    tools = step.get("tools") or []
+    if isinstance(tools, dict):
+        return tools.get("tool_names") or []
+    return tools
+
+
+def compact_workflow_record(workflow_id: str, workflow_data: Dict) -> Dict:
+    """Reduce exported workflow data to the compact record used for deduplication"""
+    metadata = workflow_data.get("metadata", {})
+    workflow = workflow_data.get("workflow", {})
+
+    # Extract tool information (order-preserving dedup keeps prompts stable)
+    steps = workflow.get("steps", [])
+    tool_names = dict.fromkeys(
+        chain.from_iterable(step_tool_names(step) for step in steps if step.get("step_type") == "tool")
+    )
+
+    return {
+        "id": workflow_id,
+        "summary": metadata.get("summary") or workflow.get("summary", ""),
+        "domain": metadata.get("domain") or workflow.get("domain") or "unknown",
+        "url_pattern": metadata.get("url_pattern") or workflow.get("url_pattern", ""),
+        "step_count": len(steps),
+        "step_types": sorted({step.get("step_type") or "unknown" for step in steps}),
+        "tool_names": list(tool_names),
+    }
+
+
+def sanitize_name(name: str) -> str:
+    """Sanitize a name to be filesystem-safe"""
+    # Replace invalid characters with underscores
+    if name.isascii():
+        sanitized = name.translate(_SANITIZE_TABLE)
+    else:
+        sanitized = "".join(c if c.isalnum() or c in ".-_" else "_" for c in name)
+    # Remove multiple underscores
+    sanitized = _COLLAPSE_UNDERSCORES.sub("_", sanitized).strip("_")
+    return sanitized or "unknown"
+
+
+def uuid7() -> str:
+    """Time-ordered UUID (RFC 9562 version 7): 48-bit millisecond timestamp followed by random bits"""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
@@ -1,21 +1,153 @@
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from loguru import logger
+import asyncio
+import hashlib
 import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
+import httpx
+import numpy as np
+from cachetools import LRUCache, TTLCache
 
 from app.schemas.workflows import WorkflowSchema
-from app.services.utils import load_prompt
-from openai import OpenAI
+from app.services.micro_clusters import cluster_sequences
+from app.services.minhash import jaccard, lsh_candidate_pairs, minhash_signatures
+from app.services.rate_limiter import RequestRateLimiter
+from app.services.utils import (
+    compact_workflow_record,
+    dump_json_bytes,
+    load_json_bytes,
+    prompt_parts,
+    sanitize_name,
+)
+from openai import AsyncOpenAI, APIConnectionError, APIError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 from app.core.config import settings
 
+try:
+    import ijson
+except ImportError:  # optional, large workflow files fall back to a full parse
+    ijson = None
+
+# Transient API failures and malformed JSON are retried before falling back to "all unique"
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError, json.JSONDecodeError)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Workflow files above this size are stream-parsed so step bodies and analyses are never materialized
+STREAMING_PARSE_THRESHOLD = 32 * 1024
+
+# Structured output schema: each pair is [index_a, index_b, score]
+DEDUPLICATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "workflow_deduplication",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "pairs": {"type": "array", "items": {"type": "array", "items": {"type": "number"}}},
+            },
+            "required": ["pairs"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Content hash -> (file, workflow id) of workflows this process has exported; re-ingested events regenerate
+# identical workflows, which are skipped while that file still holds the exported workflow
+_SEEN_WORKFLOW_HASHES: LRUCache = LRUCache(maxsize=50_000)
+
+
+@dataclass
+class BatchRequest:
+    """A deduplication prompt queued for the OpenAI Batch API"""
+
+    custom_id: str
+    body: Dict
+
+
+@dataclass
+class BatchRun:
+    """State of one batch-mode deduplication call: prompts collected on the first pass, results for the second"""
+
+    requests: Optional[Dict[str, BatchRequest]] = field(default_factory=dict)
+    results: Dict[str, str] = field(default_factory=dict)
+
+
+# The deduplicator is shared across requests, so batch state is scoped to the calling task (and the tasks
+# it spawns) rather than stored on the instance
+_BATCH_RUN: ContextVar[Optional[BatchRun]] = ContextVar("deduplication_batch_run", default=None)
+
 
 class WorkflowDeduplicator:
     """LLM-powered service for deduplicating similar workflows"""
 
-    def __init__(self, workflows_dir: str = "workflows", similarity_threshold: float = 0.7):
+    def __init__(
+        self,
+        workflows_dir: str = "workflows",
+        similarity_threshold: float = 0.7,
+        existing_chunk_size: int = 20,
+        candidates_per_workflow: int = 10,
+        candidate_similarity_threshold: float = 0.6,
+        candidate_mass_coverage: float = 0.95,
+        sequence_similarity_threshold: float = 0.9,
+        candidate_jaccard_threshold: float = 0.4,
+        batch_mode: bool = False,
+        batch_poll_interval: float = 30.0,
+    ):
         self.workflows_dir = Path(workflows_dir)
+        self.embeddings_dir = self.workflows_dir / ".embeddings"
         self.similarity_threshold = similarity_threshold
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.existing_chunk_size = existing_chunk_size
+        self.candidates_per_workflow = candidates_per_workflow
+        self.candidate_similarity_threshold = candidate_similarity_threshold
+        self.candidate_mass_coverage = candidate_mass_coverage
+        self.sequence_similarity_threshold = sequence_similarity_threshold
+        self.candidate_jaccard_threshold = candidate_jaccard_threshold
+        # Batch mode trades latency for cost on large offline runs (see deduplicate_workflows)
+        self.batch_mode = batch_mode
+        self.batch_poll_interval = batch_poll_interval
+        # Compact index of existing workflows by domain, invalidated by the directory mtime. Scans run in worker
+        # threads, so the three fields are replaced (never mutated) together under the lock
+        self._index_lock = threading.Lock()
+        self._index_cache: Dict[str, List[Dict]] = {}
+        self._index_all: Optional[List[Dict]] = None
+        self._index_dir_mtime: Optional[int] = None
+        # Bounds concurrent LLM calls across chunks and domains
+        self._semaphore = asyncio.Semaphore(settings.openai_concurrency)
+        self._rate_limiter = RequestRateLimiter(settings.openai_requests_per_minute)
+        # Single-flight map and short-lived results for identical deduplication prompts
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._result_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+        # Shared connection pool so concurrent LLM calls multiplex over keep-alive HTTP/2 connections;
+        # the transport also retries failed connection attempts (pool options belong on the transport)
+        self._http = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                retries=2,
+            ),
+            timeout=httpx.Timeout(60, connect=5),
+        )
+        # tenacity in _request_similar_pairs is the only retry policy for completions, so every attempt takes a
+        # rate-limiter token; the SDK's own retries would multiply requests behind the limiter's back
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key, http_client=self._http, max_retries=0)
+
+    async def close(self):
+        """Close the underlying HTTP connection pool"""
+        await self.client.close()
+        await self._http.aclose()
 
     async def deduplicate_workflows(self, workflows: List[WorkflowSchema]) -> List[WorkflowSchema]:
         """Remove duplicate workflows using LLM analysis against existing workflows"""
@@ -24,29 +156,89 @@ class WorkflowDeduplicator:
 
         logger.info(f"Starting LLM deduplication of {len(workflows)} workflows against existing workflows")
 
-        # Group by domain and deduplicate each domain
+        seen_count = len(workflows)
+        # Checking remembered exports reads their files, so it runs off the event loop
+        workflows = await asyncio.to_thread(
+            lambda: [workflow for workflow in workflows if not self._already_exported(workflow)]
+        )
+        if len(workflows) < seen_count:
+            logger.info(f"Dropped {seen_count - len(workflows)} workflows already deduplicated earlier")
+        if not workflows:
+            return []
+
         workflows_by_domain = self._group_by_domain(workflows)
-        unique_workflows = []
 
-        for domain, domain_workflows in workflows_by_domain.items():
-            logger.info(f"Deduplicating {len(domain_workflows)} workflows for domain: {domain}")
+        batch_token = _BATCH_RUN.set(BatchRun()) if self.batch_mode else None
+        try:
+            if batch_token is not None:
+                # First pass only collects prompts; the second pass below then reads the batch results
+                batch_run = _BATCH_RUN.get()
+                await self._deduplicate_domains(workflows_by_domain)
+                batch_requests = list(batch_run.requests.values())
+                batch_run.requests = None
+                if batch_requests:
+                    batch_run.results = await self._run_batch(batch_requests)
+
+            domain_results = await self._deduplicate_domains(workflows_by_domain)
+        finally:
+            if batch_token is not None:
+                _BATCH_RUN.reset(batch_token)
+        unique_workflows = [workflow for domain_unique in domain_results for workflow in domain_unique]
 
-            # Get existing workflows for this domain
-            existing_workflows = self._get_existing_workflows_from_json(domain_filter=domain, limit=100)
-            logger.info(f"Found {len(existing_workflows)} existing workflows for domain: {domain}")
+        logger.info(f"LLM deduplication complete: {len(workflows)} → {len(unique_workflows)} workflows")
+        return unique_workflows
 
-            # Deduplicate against existing workflows
-            if existing_workflows:
-                final_unique = await self._deduplicate_against_existing(domain_workflows, existing_workflows)
-            else:
-                # No existing workflows, just deduplicate within current batch
-                final_unique = await self._deduplicate_within_batch(domain_workflows)
+    def remember_exported(self, exported: List[Tuple[WorkflowSchema, str]]):
+        """Record successfully exported workflows so identical regenerations are skipped"""
+        for workflow, file_path in exported:
+            _SEEN_WORKFLOW_HASHES[self._content_hash(workflow)] = (file_path, workflow.id)
 
-            unique_workflows.extend(final_unique)
-            logger.info(f"Kept {len(final_unique)} unique workflows for domain: {domain}")
+    def _already_exported(self, workflow: WorkflowSchema) -> bool:
+        """Check whether an identical workflow was exported by this process and its file still holds it"""
+        seen = _SEEN_WORKFLOW_HASHES.get(self._content_hash(workflow))
+        if seen is None:
+            return False
 
-        logger.info(f"LLM deduplication complete: {len(workflows)} → {len(unique_workflows)} workflows")
-        return unique_workflows
+        # Export filenames are not unique, so a later workflow may have replaced the file; compare its id
+        file_path, workflow_id = seen
+        try:
+            with open(file_path, "rb") as f:
+                exported_id = load_json_bytes(f.read()).get("metadata", {}).get("id")
+        except (OSError, ValueError, AttributeError):
+            return False
+        return exported_id == workflow_id
+
+    async def _deduplicate_domains(
+        self, workflows_by_domain: Dict[str, List[WorkflowSchema]]
+    ) -> List[List[WorkflowSchema]]:
+        """Deduplicate all domains concurrently (LLM calls share the semaphore)"""
+        return await asyncio.gather(
+            *(
+                self._deduplicate_domain(domain, domain_workflows)
+                for domain, domain_workflows in workflows_by_domain.items()
+            )
+        )
+
+    async def _deduplicate_domain(self, domain: str, domain_workflows: List[WorkflowSchema]) -> List[WorkflowSchema]:
+        """Deduplicate one domain's workflows against its existing workflows"""
+        logger.info(f"Deduplicating {len(domain_workflows)} workflows for domain: {domain}")
+
+        # Content-identical workflows never need an LLM to tell them apart
+        domain_workflows = self._drop_exact_duplicates(domain_workflows, self._content_hash)
+
+        # Get existing workflows for this domain (file I/O runs off the event loop)
+        existing_workflows = await asyncio.to_thread(self._get_existing_workflows_from_json, domain, 100)
+        logger.info(f"Found {len(existing_workflows)} existing workflows for domain: {domain}")
+
+        # Deduplicate against existing workflows
+        if existing_workflows:
+            final_unique = await self._deduplicate_against_existing(domain_workflows, existing_workflows)
+        else:
+            # No existing workflows, just deduplicate within current batch
+            final_unique = await self._deduplicate_within_batch(domain_workflows)
+
+        logger.info(f"Kept {len(final_unique)} unique workflows for domain: {domain}")
+        return final_unique
 
     def _group_by_domain(self, workflows: List[WorkflowSchema]) -> Dict[str, List[WorkflowSchema]]:
         """Group workflows by domain"""
@@ -66,115 +258,380 @@ class WorkflowDeduplicator:
             if not self.workflows_dir.exists():
                 return []
 
-            compact_workflows = []
-            json_files = sorted(self.workflows_dir.glob("*.json"), key=lambda f: f.stat().st_mtime, reverse=True)
+            # Cached indexes stay valid until the directory changes; the mtime is read before scanning so a
+            # change during the scan invalidates what this call builds
+            dir_mtime = self.workflows_dir.stat().st_mtime_ns
+            with self._index_lock:
+                if dir_mtime == self._index_dir_mtime:
+                    index_cache, index_all = self._index_cache, self._index_all
+                else:
+                    index_cache, index_all = {}, None
+
+            if domain_filter:
+                compact_workflows = index_cache.get(domain_filter)
+                if compact_workflows is None:
+                    compact_workflows = [
+                        compact_workflow
+                        for compact_workflow in self._build_workflow_index(domain_filter)
+                        if compact_workflow["domain"] == domain_filter
+                    ]
+                    index_cache = {**index_cache, domain_filter: compact_workflows}
+            else:
+                compact_workflows = index_all
+                if compact_workflows is None:
+                    compact_workflows = index_all = self._build_workflow_index()
 
-            for json_file in json_files:
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        workflow_data = json.load(f)
+            with self._index_lock:
+                if dir_mtime == self._index_dir_mtime:
+                    # Merge with whatever other threads published for the same directory state
+                    self._index_cache = {**self._index_cache, **index_cache}
+                    self._index_all = self._index_all if index_all is None else index_all
+                elif self._index_dir_mtime is None or dir_mtime > self._index_dir_mtime:
+                    self._index_cache, self._index_all, self._index_dir_mtime = index_cache, index_all, dir_mtime
 
-                    metadata = workflow_data.get("metadata", {})
-                    workflow = workflow_data.get("workflow", {})
-                    domain = metadata.get("domain") or workflow.get("domain") or "unknown"
+            return compact_workflows[:limit] if limit else list(compact_workflows)
 
-                    # Apply domain filter
-                    if domain_filter and domain != domain_filter:
-                        continue
+        except Exception as e:
+            logger.error(f"Failed to retrieve existing workflows from JSON: {e}")
+            return []
 
-                    # Extract tool information
-                    steps = workflow.get("steps", [])
-                    tool_names = []
-                    for step in steps:
-                        if step.get("step_type") == "tool" and step.get("tools"):
-                            tool_names.extend(step.get("tools", []))
-
-                    compact_workflow = {
-                        "id": json_file.stem,
-                        "summary": metadata.get("summary") or workflow.get("summary", ""),
-                        "domain": domain,
-                        "url_pattern": metadata.get("url_pattern") or workflow.get("url_pattern", ""),
-                        "step_count": len(steps),
-                        "tool_names": list(set(tool_names)),
-                    }
-                    compact_workflows.append(compact_workflow)
-
-                    if limit and len(compact_workflows) >= limit:
-                        break
-
-                except Exception as e:
-                    logger.warning(f"Failed to parse workflow file {json_file}: {e}")
+    def _build_workflow_index(self, domain_filter: Optional[str] = None) -> List[Dict]:
+        """Build compact records for workflow files (optionally one domain's), newest first"""
+        # Exported files are named "{domain}__...", so other domains are skipped by name;
+        # unprefixed legacy files still have to be read to learn their domain
+        safe_domain = sanitize_name(domain_filter) if domain_filter else None
+        json_files = []
+        index_files = []
+        with os.scandir(self.workflows_dir) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
                     continue
+                if entry.name.endswith(".json"):
+                    if safe_domain and "__" in entry.name and not entry.name.startswith(f"{safe_domain}__"):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    json_files.append((entry.path, stat.st_mtime_ns, stat.st_size))
+                elif entry.name.startswith("index-") and entry.name.endswith(".jsonl"):
+                    if safe_domain and entry.name != f"index-{safe_domain}.jsonl":
+                        continue
+                    index_files.append(entry.path)
+        json_files.sort(key=itemgetter(1), reverse=True)
+
+        if not json_files:
+            return []
+
+        # Reuse records the exporter appended, as long as the file has not been rewritten since
+        indexed = self._read_index_files(index_files)
+        records: List[Optional[Dict]] = []
+        stale = []
+        for position, (path, mtime_ns, _) in enumerate(json_files):
+            record = indexed.get(Path(path).stem)
+            if record is not None and record.pop("mtime_ns", None) == mtime_ns:
+                records.append(record)
+            else:
+                records.append(None)
+                stale.append(position)
+
+        if stale:
+            # File reads release the GIL, so a thread pool overlaps I/O across files
+            with ThreadPoolExecutor(max_workers=min(16, len(stale))) as executor:
+                parsed = executor.map(
+                    self._parse_one_workflow_file,
+                    (Path(json_files[position][0]) for position in stale),
+                    (json_files[position][2] for position in stale),
+                )
+                for position, record in zip(stale, parsed):
+                    records[position] = record
+
+        compact_workflows = [record for record in records if record]
+        logger.debug(f"Indexed {len(compact_workflows)} existing workflow files ({len(stale)} parsed)")
+        return compact_workflows
+
+    def _read_index_files(self, index_files: List[str]) -> Dict[str, Dict]:
+        """Read the exporter's per-domain index files, keeping the newest record per workflow id"""
+        indexed: Dict[str, Dict] = {}
+        for index_file in index_files:
+            try:
+                with open(index_file, "rb") as f:
+                    for line in f:
+                        try:
+                            record = load_json_bytes(line)
+                        except ValueError:
+                            # Torn trailing line from an interrupted append; the file gets parsed instead
+                            continue
+                        current = indexed.get(record["id"])
+                        if current is None or record.get("mtime_ns", 0) >= current.get("mtime_ns", 0):
+                            indexed[record["id"]] = record
+            except OSError as e:
+                logger.warning(f"Failed to read workflow index {index_file}: {e}")
+        return indexed
+
+    def _parse_one_workflow_file(self, json_file: Path, file_size: int = 0) -> Optional[Dict]:
+        """Parse a workflow file into its compact record, or None if it cannot be read"""
+        try:
+            if ijson is not None and file_size > STREAMING_PARSE_THRESHOLD:
+                workflow_data = self._stream_workflow_fields(json_file)
+            else:
+                with open(json_file, "rb") as f:
+                    workflow_data = load_json_bytes(f.read())
 
-            return compact_workflows
+            return compact_workflow_record(json_file.stem, workflow_data)
 
         except Exception as e:
-            logger.error(f"Failed to retrieve existing workflows from JSON: {e}")
-            return []
+            logger.warning(f"Failed to parse workflow file {json_file}: {e}")
+            return None
+
+    @staticmethod
+    def _stream_workflow_fields(json_file: Path) -> Dict:
+        """Stream only metadata and per-step type/tools out of a large workflow file"""
+        with open(json_file, "rb") as f:
+            # metadata is written first, so stop as soon as it has been read
+            metadata = next(ijson.items(f, "metadata", use_float=True), {})
+        with open(json_file, "rb") as f:
+            steps = [
+                {"step_type": step.get("step_type"), "tools": step.get("tools")}
+                for step in ijson.items(f, "workflow.steps.item", use_float=True)
+            ]
+        return {"metadata": metadata, "workflow": {"steps": steps}}
 
     async def _deduplicate_against_existing(
         self, new_workflows: List[WorkflowSchema], existing_workflows: List[Dict]
     ) -> List[WorkflowSchema]:
         """Deduplicate new workflows against existing ones using LLM"""
-        # Prepare data for LLM analysis
-        workflow_data = []
-
-        # Add new workflows
-        for i, workflow in enumerate(new_workflows):
-            workflow_data.append(
-                {
-                    "index": i,
-                    "summary": workflow.summary,
-                    "domain": workflow.domain,
-                    "url_pattern": workflow.url_pattern,
-                    "steps": [
-                        {"description": step.description, "step_type": step.step_type, "tools": step.tools or []}
-                        for step in workflow.steps
-                    ],
-                }
-            )
-
-        # Add existing workflows
-        for existing in existing_workflows:
-            workflow_data.append(
-                {
-                    "index": f"existing_{existing['id']}",
-                    "summary": existing["summary"],
-                    "domain": existing["domain"],
-                    "url_pattern": existing["url_pattern"],
-                    "steps": [
-                        {"description": f"Step {i+1}", "step_type": "browser_context", "tools": []}
-                        for i in range(existing.get("step_count", 1))
-                    ],
-                }
+        existing_workflows = await self._select_candidates(new_workflows, existing_workflows)
+        if not existing_workflows:
+            # Nothing existing is close enough to matter, only the batch itself needs deduplicating
+            return await self._deduplicate_within_batch(new_workflows)
+
+        offset = len(new_workflows)
+
+        # Compare against small chunks of existing workflows concurrently to keep prompts short
+        chunk_starts = range(0, len(existing_workflows), self.existing_chunk_size)
+        chunk_results = await asyncio.gather(
+            *(
+                self._analyze_with_llm(self._workflows_payload(new_workflows, chunk), offset + len(chunk))
+                for chunk in (existing_workflows[start : start + self.existing_chunk_size] for start in chunk_starts)
             )
+        )
 
-        # Use LLM to identify duplicates
-        result = await self._analyze_with_llm(workflow_data)
+        # Map chunk-local existing indices back to their position in existing_workflows
+        pairs = []
+        for start, chunk_pairs in zip(chunk_starts, chunk_results):
+            for i, j, score in chunk_pairs:
+                pairs.append((i if i < offset else i + start, j if j < offset else j + start, score))
 
-        # Extract unique indices for new workflows only
-        groups = result.get("groups", [])
-        grouped_new_indices = set()
+        groups = self._group_similar_pairs(pairs, offset + len(existing_workflows))
 
+        # Drop new workflows grouped with an existing one; keep the first of each new-only group
+        unique_workflows = []
         for group in groups:
-            new_indices = [idx for idx in group if isinstance(idx, int) and idx < len(new_workflows)]
-            grouped_new_indices.update(new_indices)
+            new_indices = [idx for idx in group if idx < offset]
+            if not new_indices:
+                continue
+            if len(new_indices) < len(group):
+                logger.debug(f"Dropped {len(new_indices)} workflows matching existing workflows")
+                continue
+            unique_workflows.append(new_workflows[new_indices[0]])
 
-        # Keep only new workflows that are NOT grouped (i.e., unique)
-        unique_indices = [i for i in range(len(new_workflows)) if i not in grouped_new_indices]
-        return [new_workflows[i] for i in unique_indices]
+        return unique_workflows
 
     async def _deduplicate_within_batch(self, workflows: List[WorkflowSchema]) -> List[WorkflowSchema]:
         """Deduplicate workflows within the current batch using LLM"""
         if len(workflows) <= 1:
             return workflows
 
-        # Prepare workflow data for LLM
-        workflow_data = []
-        for i, workflow in enumerate(workflows):
-            workflow_data.append(
+        # Collapse exact fingerprint matches (e.g. re-ingested events) without an LLM call
+        workflows = self._drop_exact_duplicates(workflows, self._fingerprint)
+        # Then near-identical step sequences on the same URL pattern
+        workflows = self._merge_near_duplicates(workflows)
+        if len(workflows) <= 1:
+            return workflows
+
+        # Use LLM to identify similar pairs, then group them client-side
+        pairs = await self._analyze_with_llm(self._workflows_payload(workflows), len(workflows))
+        groups = self._group_similar_pairs(pairs, len(workflows))
+
+        # Keep the first workflow from each group
+        unique_workflows = []
+        for group in groups:
+            unique_workflows.append(workflows[group[0]])
+            if len(group) > 1:
+                logger.debug(f"Grouped {len(group)} similar workflows, kept: {workflows[group[0]].summary[:50]}...")
+
+        return unique_workflows
+
+    async def _select_candidates(
+        self, new_workflows: List[WorkflowSchema], existing_workflows: List[Dict]
+    ) -> List[Dict]:
+        """Keep existing workflows that are among the nearest (by embedding) to a new workflow and similar enough"""
+        try:
+            new_vectors = await self._embed(
+                [
+                    self._embedding_text(
+                        workflow.summary, workflow.url_pattern, [step.step_type for step in workflow.steps]
+                    )
+                    for workflow in new_workflows
+                ]
+            )
+            existing_vectors = await self._embed(
+                [
+                    self._embedding_text(existing["summary"], existing["url_pattern"], existing.get("step_types", []))
+                    for existing in existing_workflows
+                ]
+            )
+        except APIError as e:
+            logger.warning(f"Embedding lookup failed, selecting candidates with MinHash instead: {e}")
+            return self._select_candidates_by_minhash(new_workflows, existing_workflows)
+
+        # Vectors are L2-normalized, so one matrix product gives every cosine similarity
+        similarities = new_vectors @ existing_vectors.T
+        candidate_mask = similarities > self.candidate_similarity_threshold
+
+        k = self.candidates_per_workflow
+        if len(existing_workflows) > k:
+            # Restrict each new workflow to its k nearest existing workflows
+            nearest = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_k_mask = np.zeros_like(candidate_mask)
+            np.put_along_axis(top_k_mask, nearest, True, axis=1)
+            candidate_mask &= top_k_mask
+
+        selected = np.flatnonzero(candidate_mask.any(axis=0))
+
+        # Most similar first, so the likeliest duplicates share the first chunks
+        best = np.where(candidate_mask, similarities, -np.inf).max(axis=0)[selected]
+        order = np.argsort(-best, kind="stable")
+        selected, best = selected[order], best[order]
+
+        # Drop the low-similarity tail once the kept candidates cover most of the similarity mass,
+        # rounding up to whole chunks since a partially filled chunk costs the same LLM call
+        mass = np.cumsum(best - self.candidate_similarity_threshold)
+        if len(mass) and mass[-1] > 0:
+            keep = int(np.searchsorted(mass, self.candidate_mass_coverage * mass[-1])) + 1
+            keep = -(-keep // self.existing_chunk_size) * self.existing_chunk_size
+            selected = selected[:keep]
+
+        logger.info(f"Selected {len(selected)} of {len(existing_workflows)} existing workflows as candidates")
+        return [existing_workflows[i] for i in selected.tolist()]
+
+    def _select_candidates_by_minhash(
+        self, new_workflows: List[WorkflowSchema], existing_workflows: List[Dict]
+    ) -> List[Dict]:
+        """Offline candidate selection: MinHash LSH collisions confirmed by exact Jaccard, most similar first"""
+        new_shingles = [
+            self._shingles(
+                workflow.summary,
+                workflow.url_pattern,
+                [step.step_type for step in workflow.steps],
+                [tool for step in workflow.steps if step.step_type == "tool" for tool in step.tools or []],
+            )
+            for workflow in new_workflows
+        ]
+        existing_shingles = [
+            self._shingles(
+                existing["summary"],
+                existing["url_pattern"],
+                existing.get("step_types", []),
+                existing.get("tool_names", []),
+            )
+            for existing in existing_workflows
+        ]
+
+        best: Dict[int, float] = {}
+        pairs = lsh_candidate_pairs(minhash_signatures(new_shingles), minhash_signatures(existing_shingles))
+        for i, j in pairs:
+            similarity = jaccard(new_shingles[i], existing_shingles[j])
+            if similarity >= self.candidate_jaccard_threshold and similarity > best.get(j, -1.0):
+                best[j] = similarity
+
+        selected = sorted(best, key=lambda j: (-best[j], j))
+        logger.info(f"Selected {len(selected)} of {len(existing_workflows)} existing workflows as MinHash candidates")
+        return [existing_workflows[j] for j in selected]
+
+    def _shingles(
+        self, summary: str, url_pattern: Optional[str], step_types: List[str], tool_names: List[str]
+    ) -> Set[str]:
+        """Token set for MinHash: summary words plus URL pattern, step types and tools"""
+        shingles = set(re.findall(r"\w+", summary.lower()))
+        shingles.add(f"url:{url_pattern or ''}")
+        shingles.update(f"step:{step_type}" for step_type in step_types)
+        shingles.update(f"tool:{tool}" for tool in tool_names)
+        return shingles
+
+    def _embedding_text(self, summary: str, url_pattern: Optional[str], step_types: List[str]) -> str:
+        """Text embedded for similarity pre-filtering"""
+        return f"{summary.strip()} | {url_pattern or ''} | {' '.join(sorted(set(step_types)))}"
+
+    def _embedding_cache_path(self, text: str) -> Path:
+        """Location of the cached embedding for a text, keyed by content hash"""
+        digest = hashlib.blake2b(f"{EMBEDDING_MODEL}|{text}".encode(), digest_size=16).hexdigest()
+        return self.embeddings_dir / f"{digest}.npy"
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as L2-normalized rows, reusing vectors cached on disk by content hash"""
+        cache_paths = [self._embedding_cache_path(text) for text in texts]
+        # Cache reads and writes are blocking file I/O, so they run off the event loop
+        vectors = await asyncio.to_thread(self._load_cached_embeddings, cache_paths)
+
+        # Embed every cache miss in a single request
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            async with self._semaphore:
+                await self._rate_limiter.acquire()
+                response = await self.client.embeddings.create(model=EMBEDDING_MODEL, input=[texts[i] for i in missing])
+
+            new_vectors = {}
+            for i, item in zip(missing, response.data):
+                vector = np.asarray(item.embedding, dtype=np.float32)
+                vector /= np.linalg.norm(vector) or 1.0
+                vectors[i] = new_vectors[cache_paths[i]] = vector
+            await asyncio.to_thread(self._save_cached_embeddings, new_vectors)
+
+        return np.vstack(vectors)
+
+    def _load_cached_embeddings(self, cache_paths: List[Path]) -> List[Optional[np.ndarray]]:
+        """Load cached embeddings, with None for each cache miss"""
+        vectors: List[Optional[np.ndarray]] = []
+        for path in cache_paths:
+            try:
+                vectors.append(np.load(path))
+            except (OSError, ValueError):
+                vectors.append(None)
+        return vectors
+
+    def _save_cached_embeddings(self, vectors: Dict[Path, np.ndarray]):
+        """Write newly computed embeddings to the on-disk cache"""
+        self.embeddings_dir.mkdir(parents=True, exist_ok=True)
+        for path, vector in vectors.items():
+            try:
+                np.save(path, vector)
+            except OSError as e:
+                logger.warning(f"Failed to cache embedding {path}: {e}")
+
+    def _workflows_payload(
+        self, new_workflows: List[WorkflowSchema], existing_workflows: Optional[List[Dict]] = None
+    ) -> str:
+        """Assemble the prompt's JSON workflow list, new workflows first, from memoized fragments"""
+        entries = [
+            b'{"index":%d,%s}' % (i, self._workflow_fragment(workflow)) for i, workflow in enumerate(new_workflows)
+        ]
+        offset = len(new_workflows)
+        entries.extend(
+            b'{"index":%d,%s}'
+            % (
+                offset + j,
+                self._existing_fragment(
+                    existing["summary"], existing["domain"], existing["url_pattern"], existing.get("step_count", 1)
+                ),
+            )
+            for j, existing in enumerate(existing_workflows or [])
+        )
+        return (b"[" + b",".join(entries) + b"]").decode("utf-8")
+
+    def _workflow_fragment(self, workflow: WorkflowSchema) -> bytes:
+        """Serialize a new workflow's prompt entry (without braces or index) once per workflow"""
+        if workflow._prompt_fragment is None:
+            workflow._prompt_fragment = dump_json_bytes(
                 {
-                    "index": i,
                     "summary": workflow.summary,
                     "domain": workflow.domain,
                     "url_pattern": workflow.url_pattern,
@@ -183,60 +640,269 @@ class WorkflowDeduplicator:
                         for step in workflow.steps
                     ],
                 }
-            )
+            )[1:-1]
+        return workflow._prompt_fragment
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _existing_fragment(summary: str, domain: str, url_pattern: str, step_count: int) -> bytes:
+        """Serialize an existing workflow's prompt entry (without braces or index); only its step count is sent"""
+        return dump_json_bytes(
+            {
+                "summary": summary,
+                "domain": domain,
+                "url_pattern": url_pattern,
+                "steps": [
+                    {"description": f"Step {i+1}", "step_type": "browser_context", "tools": []}
+                    for i in range(step_count)
+                ],
+            }
+        )[1:-1]
 
-        # Use LLM to analyze similarities
-        result = await self._analyze_with_llm(workflow_data)
+    def _drop_exact_duplicates(
+        self, workflows: List[WorkflowSchema], key: Callable[[WorkflowSchema], str]
+    ) -> List[WorkflowSchema]:
+        """Bucket workflows by key and keep the best workflow from each bucket"""
+        buckets: Dict[str, List[WorkflowSchema]] = {}
+        for workflow in workflows:
+            buckets.setdefault(key(workflow), []).append(workflow)
 
-        # Keep the first workflow from each group
-        groups = result.get("groups", [])
-        unique_workflows = []
+        if len(buckets) == len(workflows):
+            return workflows
 
-        for group in groups:
-            if group and group[0] < len(workflows):
-                unique_workflows.append(workflows[group[0]])
-                if len(group) > 1:
-                    logger.debug(f"Grouped {len(group)} similar workflows, kept: {workflows[group[0]].summary[:50]}...")
+        logger.info(f"Dropped {len(workflows) - len(buckets)} exact duplicate workflows before LLM")
+        return [self._select_best_workflow_from_group(bucket) for bucket in buckets.values()]
 
-        return unique_workflows
-
-    async def _analyze_with_llm(self, workflow_data: List[Dict]) -> Dict:
-        """Use LLM to analyze workflow similarities"""
-        prompt = load_prompt(
-            "workflow_deduplication.txt",
-            variables={
-                "workflows": json.dumps(workflow_data, indent=2),
-                "similarity_threshold": self.similarity_threshold,
-            },
+    def _merge_near_duplicates(self, workflows: List[WorkflowSchema]) -> List[WorkflowSchema]:
+        """Micro-cluster workflows by step sequence and keep the best workflow from each cluster"""
+        clusters = cluster_sequences(
+            [(workflow.url_pattern or "", self._step_sequence(workflow), workflow) for workflow in workflows],
+            self.sequence_similarity_threshold,
         )
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-5-mini-2025-08-07",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert at analyzing workflow similarities and identifying duplicates.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-            )
+        if len(clusters) == len(workflows):
+            return workflows
 
-            if not response.choices[0].message.content:
-                raise Exception("No response from LLM")
+        logger.info(f"Merged {len(workflows) - len(clusters)} near-duplicate workflows before LLM")
+        return [self._select_best_workflow_from_group(cluster.members) for cluster in clusters]
 
-            result_text = response.choices[0].message.content.strip()
-            logger.debug(f"LLM deduplication response: {result_text}")
+    def _step_sequence(self, workflow: WorkflowSchema) -> Tuple[str, ...]:
+        """Step tokens for sequence matching: tool steps by their tools, browser steps by what they extract"""
+        return tuple(
+            (
+                f"tool:{','.join(sorted(step.tools or []))}"
+                if step.step_type == "tool"
+                else f"browser_context:{(step.context_description or step.description).strip().lower()}"
+            )
+            for step in workflow.steps
+        )
 
-            # Parse JSON response (handle markdown code blocks)
-            if result_text.startswith("```json"):
-                result_text = result_text[7:]
-            if result_text.endswith("```"):
-                result_text = result_text[:-3]
+    def _select_best_workflow_from_group(self, workflows: List[WorkflowSchema]) -> WorkflowSchema:
+        """Pick the highest quality workflow, preferring the earliest on ties"""
+        return max(workflows, key=self._calculate_workflow_quality_score)
+
+    def _calculate_workflow_quality_score(self, workflow: WorkflowSchema) -> float:
+        """Heuristic completeness score: steps, tool references, extraction context and summary detail"""
+        if workflow._quality_score is not None:
+            return workflow._quality_score
+
+        # Single pass over the steps
+        score = min(len(workflow.summary), 200) / 100
+        for step in workflow.steps:
+            score += 1.0
+            if step.tools:
+                score += len(step.tools)
+            if step.context_description:
+                score += 1.0
+
+        workflow._quality_score = score
+        return score
+
+    def _content_hash(self, workflow: WorkflowSchema) -> str:
+        """Canonical hash of summary, URL pattern, step types/descriptions and tools"""
+        if workflow._content_digest is not None:
+            return workflow._content_digest
+
+        canonical = {
+            "s": workflow.summary.strip().lower(),
+            "u": workflow.url_pattern or "",
+            "steps": [(step.step_type, (step.description or "").strip().lower()) for step in workflow.steps],
+            "tools": sorted({tool for step in workflow.steps for tool in step.tools or []}),
+        }
+        workflow._content_digest = hashlib.blake2b(dump_json_bytes(canonical), digest_size=16).hexdigest()
+        return workflow._content_digest
+
+    def _fingerprint(self, workflow: WorkflowSchema) -> str:
+        """Cheap identity of a workflow: URL pattern, tools, step count and summary prefix"""
+        url = (workflow.url_pattern or "").strip().lower().rstrip("/")
+        tools = tuple(sorted({tool for step in workflow.steps for tool in step.tools or []}))
+        summary = workflow.summary.strip().lower()[:120]
+        key = f"{url}|{tools}|{len(workflow.steps)}|{summary}"
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def _group_similar_pairs(self, pairs: List[Tuple[int, int, float]], count: int) -> List[List[int]]:
+        """Group indices into connected components of pairs scoring at or above the similarity threshold"""
+        parent = list(range(count))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j, score in pairs:
+            if score < self.similarity_threshold:
+                continue
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                # Keep the lowest index as root so groups lead with their earliest workflow
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(count):
+            groups.setdefault(find(i), []).append(i)
+        return list(groups.values())
+
+    def _parse_pairs(self, result_text: str, count: int) -> List[Tuple[int, int, float]]:
+        """Parse and validate LLM pairs, dropping malformed or out-of-range entries"""
+        # A response of the wrong shape raises ValueError, which callers handle like any unusable response
+        result = json.loads(result_text)
+        raw_pairs = result.get("pairs") if isinstance(result, dict) else None
+        if not isinstance(raw_pairs, list):
+            raise ValueError(f"LLM response has no pairs list: {result_text[:200]}")
+
+        pairs = []
+        for pair in raw_pairs:
+            try:
+                i, j, score = int(pair[0]), int(pair[1]), float(pair[2])
+            except (TypeError, ValueError, IndexError, KeyError):
+                logger.warning(f"Ignoring malformed similarity pair: {pair}")
+                continue
+            if i != j and 0 <= i < count and 0 <= j < count:
+                pairs.append((i, j, score))
+        return pairs
+
+    async def _analyze_with_llm(self, workflows_json: str, count: int) -> List[Tuple[int, int, float]]:
+        """Use LLM to score similar workflow pairs as (index_a, index_b, score)"""
+        prompt = workflows_json.join(
+            prompt_parts("workflow_deduplication.txt", "workflows", similarity_threshold=self.similarity_threshold)
+        )
 
-            return json.loads(result_text.strip())
+        # Identical prompts reuse a recent result or join the call already in flight
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        batch_run = _BATCH_RUN.get()
+        if batch_run is not None and batch_run.requests is not None:
+            batch_run.requests.setdefault(key, BatchRequest(custom_id=key, body=self._completion_body(prompt)))
+            return []
+        if batch_run is not None and key in batch_run.results:
+            try:
+                return self._parse_pairs(batch_run.results[key], count)
+            except ValueError as e:
+                logger.warning(f"Unusable batch result, retrying in real time: {e}")
+        if key in self._result_cache:
+            return self._result_cache[key]
+        if key in self._inflight:
+            pairs = await asyncio.shield(self._inflight[key])
+            # None means the shared call failed: treat every workflow as unique
+            return pairs if pairs is not None else []
+
+        inflight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = inflight
+        pairs = None
+        try:
+            pairs = await self._request_similar_pairs(prompt, count)
+            self._result_cache[key] = pairs
+            return pairs
 
-        except Exception as e:
+        except (APIError, ValueError) as e:
             logger.error(f"LLM analysis failed: {e}")
-            # Fallback: treat all as unique
-            return {"groups": [[i] for i in range(len(workflow_data))]}
+            # Fallback: no similar pairs, so every workflow is treated as unique
+            return []
+
+        finally:
+            inflight.set_result(pairs)
+            del self._inflight[key]
+
+    def _completion_body(self, prompt: str) -> Dict:
+        """Build the chat completion request shared by real-time and batch calls"""
+        return {
+            "model": "gpt-5-mini-2025-08-07",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an expert at analyzing workflow similarities and identifying duplicates.",
+                },
+                {"role": "user", "content": prompt},
+            ],
+            "response_format": DEDUPLICATION_RESPONSE_FORMAT,
+        }
+
+    async def _run_batch(self, batch_requests: List[BatchRequest]) -> Dict[str, str]:
+        """Submit queued prompts as one OpenAI Batch job and return the responses by custom_id"""
+        logger.info(f"Submitting {len(batch_requests)} deduplication prompts as a batch job")
+        payload = b"".join(
+            dump_json_bytes(
+                {"custom_id": request.custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": request.body}
+            )
+            + b"\n"
+            for request in batch_requests
+        )
+
+        try:
+            input_file = await self.client.files.create(file=("deduplication.jsonl", payload), purpose="batch")
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window="24h"
+            )
+            while batch.status not in BATCH_TERMINAL_STATUSES:
+                await asyncio.sleep(self.batch_poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+
+            if batch.status != "completed" or not batch.output_file_id:
+                # Prompts without a batch result fall back to real-time calls
+                logger.error(f"Deduplication batch {batch.id} ended with status {batch.status}")
+                return {}
+
+            output = await self.client.files.content(batch.output_file_id)
+
+        except APIError as e:
+            logger.error(f"Deduplication batch failed: {e}")
+            return {}
+
+        results = {}
+        for line in output.content.splitlines():
+            if not line.strip():
+                continue
+            result = load_json_bytes(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            if content:
+                results[result["custom_id"]] = content
+
+        logger.info(f"Received {len(results)}/{len(batch_requests)} batch deduplication results")
+        return results
+
+    async def _request_similar_pairs(self, prompt: str, count: int) -> List[Tuple[int, int, float]]:
+        """Call the LLM with retries for transient failures and parse its similar pairs"""
+        body = self._completion_body(prompt)
+
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(5),
+            wait=wait_random_exponential(multiplier=1, max=30),
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            reraise=True,
+        ):
+            with attempt:
+                async with self._semaphore:
+                    await self._rate_limiter.acquire()
+                    response = await self.client.chat.completions.create(**body)
+
+                if not response.choices:
+                    raise ValueError("LLM response has no choices")
+                result_text = response.choices[0].message.content
+                if not result_text:
+                    raise ValueError("No response from LLM")
+
+                logger.debug(f"LLM deduplication response: {result_text}")
+                return self._parse_pairs(result_text, count)
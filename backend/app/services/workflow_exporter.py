@@ -1,49 +1,69 @@
-import json
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from datetime import datetime
 from loguru import logger
 
 from app.schemas.workflows import WorkflowSchema
+from app.services.utils import compact_workflow_record, dump_json_bytes, sanitize_name, uuid7
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; index appends are then unlocked
+    fcntl = None
 
 
 class WorkflowExporter:
     """Service for exporting workflows to organized folder structure"""
 
-    def __init__(self, output_dir: str = "workflows"):
+    def __init__(self, output_dir: str = "workflows", pretty: bool = False):
         self.output_dir = Path(output_dir)
+        # Files are machine-read by the deduplicator; indentation is only useful when inspecting them by hand
+        self.pretty = pretty
         self.output_dir.mkdir(exist_ok=True)
         logger.info(f"Workflow exporter initialized with output directory: {self.output_dir}")
 
-    def export_workflows(self, workflows: List[WorkflowSchema]) -> List[str]:
-        """Export workflows to single folder with individual JSON files"""
+    def export_workflows(self, workflows: List[WorkflowSchema]) -> List[Tuple[WorkflowSchema, str]]:
+        """Export workflows to single folder with individual JSON files, returning (workflow, file path) pairs"""
         if not workflows:
             logger.warning("No workflows to export")
             return []
 
         logger.info(f"Exporting {len(workflows)} workflows to {self.output_dir}")
 
-        exported_files = []
-
-        for i, workflow in enumerate(workflows):
-            # Create workflow file directly in the main folder
-            workflow_file = self._create_workflow_file(workflow, self.output_dir, i + 1)
-            exported_files.append(str(workflow_file))
-
-        logger.info(f"Successfully exported {len(exported_files)} workflow files")
-        return exported_files
-
-    def _sanitize_folder_name(self, name: str) -> str:
-        """Sanitize folder name to be filesystem-safe"""
-        # Replace invalid characters with underscores
-        sanitized = "".join(c if c.isalnum() or c in ".-_" else "_" for c in name)
-        # Remove multiple underscores
-        sanitized = "_".join(part for part in sanitized.split("_") if part)
-        return sanitized or "unknown"
-
-    def _create_workflow_file(self, workflow: WorkflowSchema, output_folder: Path, index: int) -> Path:
-        """Create a single workflow file with all necessary information"""
+        # Create workflow files directly in the main folder; file I/O releases the GIL so writes overlap
+        with ThreadPoolExecutor(max_workers=min(8, len(workflows))) as executor:
+            futures = [
+                executor.submit(self._create_workflow_file, workflow, self.output_dir, i + 1)
+                for i, workflow in enumerate(workflows)
+            ]
+            # A failed workflow is skipped on its own; the rest of the batch is still exported and indexed
+            exported = []
+            records = []
+            for workflow, future in zip(workflows, futures):
+                try:
+                    file_path, record = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to export workflow '{workflow.summary}': {e}")
+                    continue
+                exported.append((workflow, str(file_path)))
+                records.append(record)
+
+        # One append per domain index instead of one per workflow
+        self._append_to_indexes(self.output_dir, records)
+
+        logger.info(f"Successfully exported {len(exported)} workflow files")
+        return exported
+
+    def _create_workflow_file(
+        self, workflow: WorkflowSchema, output_folder: Path, index: int
+    ) -> Tuple[Path, Dict[str, Any]]:
+        """Create a single workflow file with all necessary information, returning it with its index record"""
+        # Workflows get their id when first exported; time-ordered ids sort by creation
+        if workflow.id is None:
+            workflow.id = uuid7()
 
         # Create workflow data structure
         workflow_data = {
@@ -95,17 +115,50 @@ class WorkflowExporter:
 
             workflow_data["workflow"]["steps"].append(step_data)
 
-        # Create filename
-        safe_summary = self._sanitize_folder_name(workflow.summary)[:50]
-        filename = f"{index:02d}_{safe_summary}.json"
+        # Create filename; the domain prefix lets the deduplicator select a domain's files by name
+        safe_domain = sanitize_name(workflow.domain or "unknown")
+        safe_summary = sanitize_name(workflow.summary)[:50]
+        filename = f"{safe_domain}__{index:02d}_{safe_summary}.json"
         file_path = output_folder / filename
 
-        # Write file
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(workflow_data, f, indent=2, ensure_ascii=False)
+        # Write to a temp file and rename, so readers never see partial files and the
+        # directory mtime changes even when an existing file is replaced. The temp name is unique per write,
+        # so concurrent exports of the same filename never share (or delete) each other's temp file
+        fd, tmp_name = tempfile.mkstemp(dir=output_folder, prefix=f".{filename}.", suffix=".tmp")
+        tmp_path = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dump_json_bytes(workflow_data, indent=self.pretty))
+            # mkstemp creates owner-only files; exported workflows keep the usual readable permissions
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        record = compact_workflow_record(file_path.stem, workflow_data)
+        record["mtime_ns"] = file_path.stat().st_mtime_ns
 
         logger.debug(f"Created workflow file: {file_path}")
-        return file_path
+        return file_path, record
+
+    def _append_to_indexes(self, output_folder: Path, records: List[Dict[str, Any]]):
+        """Append compact records to the per-domain indexes read by the deduplicator"""
+        lines_by_index: Dict[str, List[bytes]] = {}
+        for record in records:
+            index_name = f"index-{sanitize_name(record['domain'])}.jsonl"
+            lines_by_index.setdefault(index_name, []).append(dump_json_bytes(record) + b"\n")
+
+        for index_name, lines in lines_by_index.items():
+            index_path = output_folder / index_name
+            try:
+                with open(index_path, "ab") as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    f.write(b"".join(lines))
+            except OSError as e:
+                # The deduplicator falls back to parsing the workflow files themselves
+                logger.warning(f"Failed to update workflow index {index_path}: {e}")
 
     def _calculate_complexity_score(self, workflow: WorkflowSchema) -> int:
         """Calculate workflow complexity score"""
@@ -1,4 +1,7 @@
-from typing import List, Optional
+import asyncio
+from contextlib import aclosing
+from pathlib import Path
+from typing import List, Optional, Tuple
 from loguru import logger
 from app.schemas.browser_events import BrowserEvent
 from app.schemas.page_sessions import PageSession, PageSegment
@@ -10,6 +13,8 @@ from app.services.workflow_validator import WorkflowValidator
 from app.services.workflow_exporter import WorkflowExporter
 from app.services.tool_loader import ToolLoader
 from app.services.workflow_deduplicator import WorkflowDeduplicator
+from app.services.utils import load_prompt
+from app.core.config import settings
 
 
 class WorkflowProcessor:
@@ -19,44 +24,74 @@ class WorkflowProcessor:
         self.segmentation_service = EventSegmentationService()
         self.generalization_service = GeneralizationService()
         self.tool_loader = ToolLoader()
+        self.validator = WorkflowValidator(self.tool_loader)
         self.workflow_exporter = WorkflowExporter()
         self.deduplicator = WorkflowDeduplicator()
+        # Bounds concurrent generalization LLM calls
+        self._generalization_semaphore = asyncio.Semaphore(settings.openai_concurrency)
 
     async def process_events_for_workflows(self, events: List[BrowserEvent]) -> List[WorkflowSchema]:
         """Hierarchical workflow processing: events -> candidate workflows -> workflows"""
 
-        # Step 1: Segment events into candidate workflows (multi-page segments)
-        candidate_workflows: List[PageSegment] = await self.segmentation_service.generate_candidate_workflows(events)
+        # Steps 1-2: Segment events into candidate workflows (multi-page segments) and start generalizing
+        # each one as soon as it is classified, so generalization overlaps the remaining classifications
+        generalizations: List[Tuple[int, asyncio.Task]] = []
+        try:
+            # aclosing() runs the generator's cleanup right away, cancelling pending classifications on failure
+            async with aclosing(self.segmentation_service.iter_candidate_workflows(events)) as candidate_workflows:
+                async for position, candidate_workflow in candidate_workflows:
+                    generalizations.append(
+                        (position, asyncio.create_task(self._generalize_candidate(candidate_workflow)))
+                    )
+        except BaseException:
+            for _, task in generalizations:
+                task.cancel()
+            raise
 
-        # Step 2: Generalize page segments into workflows
+        # Keep segment order regardless of completion order
+        generalizations.sort(key=lambda item: item[0])
+        results = await asyncio.gather(*(task for _, task in generalizations), return_exceptions=True)
         workflows: List[WorkflowSchema] = []
-
-        for candidate_workflow in candidate_workflows:
-            # Load tools based on segment's tool categories
-            tools_catalog = self.tool_loader.load_tools_by_categories(candidate_workflow.tool_categories)
-            workflow: Optional[WorkflowSchema] = await self.generalization_service.generalize_workflow(
-                candidate_workflow, tools_catalog
-            )
-            if workflow:
-                workflows.append(workflow)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Failed to generalize candidate workflow: {result}")
+            elif result:
+                workflows.append(result)
 
         # Step 3: Validate and filter workflows (load all tools for validation)
         validated_workflows: List[WorkflowSchema] = self._validate_workflows(workflows)
         unique_workflows: List[WorkflowSchema] = await self.deduplicator.deduplicate_workflows(validated_workflows)
 
-        # Step 4: Export workflows to organized folder structure
+        # Step 4: Export workflows to organized folder structure (blocking file I/O runs off the event loop)
         if unique_workflows:
-            self.workflow_exporter.export_workflows(unique_workflows)
+            exported = await asyncio.to_thread(self.workflow_exporter.export_workflows, unique_workflows)
+            self.deduplicator.remember_exported(exported)
 
         return unique_workflows
 
+    async def _generalize_candidate(self, candidate_workflow: PageSegment) -> Optional[WorkflowSchema]:
+        """Generalize one candidate workflow with the tools of its categories"""
+        # Load tools based on segment's tool categories
+        tools_catalog = self.tool_loader.load_tools_by_categories(candidate_workflow.tool_categories)
+        async with self._generalization_semaphore:
+            return await self.generalization_service.generalize_workflow(candidate_workflow, tools_catalog)
+
+    def warm_up(self):
+        """Read prompt templates ahead of the first request; tool catalogs already load in __init__"""
+        for prompt_file in Path("prompts").glob("*.txt"):
+            load_prompt(prompt_file.name)
+
+    async def close(self):
+        """Release network resources held by the processing services"""
+        await self.segmentation_service.close()
+        await self.generalization_service.close()
+        await self.deduplicator.close()
+
     def _validate_workflows(self, workflows: List[WorkflowSchema]) -> List[WorkflowSchema]:
         """Validate workflows and filter out invalid ones"""
-        validator = WorkflowValidator()
         valid_workflows = []
 
-        for workflow in workflows:
-            is_valid, error = validator.validate_workflow(workflow)
+        for workflow, (is_valid, error) in zip(workflows, self.validator.validate_workflows(workflows)):
             if is_valid:
                 valid_workflows.append(workflow)
                 logger.info(f"✅ Valid workflow: {workflow.summary}")
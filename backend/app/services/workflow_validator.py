@@ -1,4 +1,5 @@
-from typing import List
+from itertools import chain
+from typing import FrozenSet, List, Optional
 from loguru import logger
 from app.schemas.workflows import WorkflowSchema, WorkflowStepSchema
 from app.services.tool_loader import ToolLoader
@@ -7,28 +8,44 @@ from app.services.tool_loader import ToolLoader
 class WorkflowValidator:
     """Validates workflows against available tools and constraints"""
 
-    def __init__(self):
-        self.tool_loader = ToolLoader()
-        self.valid_step_types = {"browser_context", "tool"}
+    def __init__(self, tool_loader: Optional[ToolLoader] = None):
+        self.tool_loader = tool_loader or ToolLoader()
+        self.valid_step_types = frozenset({"browser_context", "tool"})
+        # Tool availability doesn't change between workflows, so load it once per validator
+        self.available_tool_names: FrozenSet[str] = frozenset(
+            tool.name for tool in self.tool_loader.load_all_tools().tools
+        )
 
     def validate_workflow(self, workflow: WorkflowSchema) -> tuple[bool, str]:
         """Validate workflow and return (is_valid, error_message)"""
-
-        # Check tool availability
-        available_tools = self.tool_loader.load_all_tools()
-        available_tool_names = {tool.name for tool in available_tools.tools}
-
-        for step in workflow.steps:
-            if step.step_type == "tool":
-                for tool in step.tools or []:
-                    if tool not in available_tool_names:
-                        return False, f"Tool '{tool}' not available"
-
-        # Check step validity
-        if not self._has_valid_steps(workflow.steps):
-            return False, "Invalid workflow steps"
-
-        return True, ""
+        return self.validate_workflows([workflow])[0]
+
+    def validate_workflows(self, workflows: List[WorkflowSchema]) -> List[tuple[bool, str]]:
+        """Validate a batch of workflows and return (is_valid, error_message) for each"""
+        requested_tools = [
+            [tool for step in workflow.steps if step.step_type == "tool" for tool in step.tools or []]
+            for workflow in workflows
+        ]
+        # One set difference finds every unavailable tool in the batch
+        unavailable_tools = set(chain.from_iterable(requested_tools)) - self.available_tool_names
+
+        results = []
+        for workflow, tools in zip(workflows, requested_tools):
+            # Check tool availability
+            missing_tool = (
+                next((tool for tool in tools if tool in unavailable_tools), None) if unavailable_tools else None
+            )
+            if missing_tool is not None:
+                results.append((False, f"Tool '{missing_tool}' not available"))
+
+            # Check step validity
+            elif not self._has_valid_steps(workflow.steps):
+                results.append((False, "Invalid workflow steps"))
+
+            else:
+                results.append((True, ""))
+
+        return results
 
     def _has_valid_steps(self, steps: List[WorkflowStepSchema]) -> bool:
         """Check if workflow has valid steps"""
@@ -39,9 +56,5 @@ class WorkflowValidator:
         if steps[0].step_type != "browser_context":
             return False
 
-        # All steps must have valid types
-        for step in steps:
-            if step.step_type not in self.valid_step_types:
-                return False
-
-        return True
+        # All steps must have valid types (one set build + subset test instead of a compare per step)
+        return {step.step_type for step in steps} <= self.valid_step_types
@@ -0,0 +1,17 @@
+import os
+
+from app.core.config import settings
+
+# Pre-fork workers, each running its own uvicorn event loop
+worker_class = "app.core.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+bind = f"{settings.api_host}:{settings.api_port}"
+backlog = settings.api_backlog
+keepalive = settings.api_keep_alive_timeout
+# Recycle workers periodically (jittered so they do not restart together) to bound memory growth
+max_requests = settings.api_max_requests
+max_requests_jitter = settings.api_max_requests_jitter
+loglevel = settings.log_level.lower()
+
+# Import the app (settings, routers, prompt templates) once in the master before forking
+preload_app = True
@@ -1,41 +1,156 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
+from loguru import logger
 
 from app.core.config import settings
+from app.core.logging import configure_logging
 from app.api.v1.api import api_router
+from app.middleware.fast_cors import FastCORSMiddleware
+from app.middleware.fast_path import FastPathMiddleware
+from app.services.utils import dump_json_bytes
+from app.services.workflow_processor import WorkflowProcessor
+
+configure_logging()
+
+# uvloop and httptools ship with uvicorn[standard]; fall back to the stdlib loop and h11 where they are unavailable
+try:
+    import uvloop  # noqa: F401
+
+    EVENT_LOOP = "uvloop"
+except ImportError:
+    EVENT_LOOP = "asyncio"
+
+try:
+    import httptools  # noqa: F401
+
+    HTTP_PROTOCOL = "httptools"
+except ImportError:
+    HTTP_PROTOCOL = "h11"
+
+try:
+    from prometheus_fastapi_instrumentator import Instrumentator, metrics
+except ImportError:  # metrics are optional; the API runs without the /metrics endpoint
+    Instrumentator = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared services and warm one-time caches before the first request"""
+    # Without an API key the LLM clients cannot be built; the app still starts (health, docs) and
+    # the events endpoint retries creating the processor on demand
+    app.state.workflow_processor = None
+    if settings.openai_api_key:
+        app.state.workflow_processor = WorkflowProcessor()
+        app.state.workflow_processor.warm_up()
+    else:
+        logger.warning("OPENAI_API_KEY is not set; workflow processing is unavailable")
+    try:
+        yield
+    finally:
+        if app.state.workflow_processor is not None:
+            await app.state.workflow_processor.close()
+        # Flush records still queued for the background writer
+        await logger.complete()
 
 
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     description="Thirdlayer Assessment: Intelligent Workflow Generation System",
+    lifespan=lifespan,
+    # Production deployments set ENABLE_DOCS=false to skip building and serving the OpenAPI schema
+    docs_url="/docs" if settings.enable_docs else None,
+    redoc_url=None,
+    openapi_url="/openapi.json" if settings.enable_docs else None,
 )
 
-# Add CORS middleware
+# Add CORS middleware; credentials are never combined with a wildcard origin, which would let any site
+# make credentialed requests
+cors_allow_credentials = "*" not in settings.cors_origins_set
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    FastCORSMiddleware,
+    allow_origins=settings.cors_origins_set,
+    allow_credentials=cors_allow_credentials,
+    allow_methods=settings.cors_allow_methods,
+    allow_headers=settings.cors_allow_headers,
 )
 
+# Compress larger responses (future list endpoints; the OpenAPI schema is pre-compressed by the fast path);
+# small bodies are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 app.include_router(api_router, prefix=settings.api_prefix)
 
+if Instrumentator is not None:
+    # Only a request counter and one latency histogram, labelled by route template so cardinality stays bounded;
+    # buckets reach minutes because interaction batches wait on LLM calls
+    (
+        Instrumentator(should_ignore_untemplated=True, excluded_handlers=["/metrics"])
+        .add(metrics.requests(metric_namespace="workflow_api"))
+        .add(
+            metrics.latency(
+                metric_namespace="workflow_api",
+                buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf")),
+            )
+        )
+        .instrument(app)
+        .expose(app, endpoint="/metrics", include_in_schema=False)
+    )
 
-@app.get("/")
+ROOT_INFO = {
+    "message": "Workflow Event Processor API",
+    "version": settings.app_version,
+    "docs": app.docs_url,
+    "health": "/healthz",
+}
+
+# Static bodies depend only on settings, so they are serialized once at import
+_ROOT_BODY = dump_json_bytes(ROOT_INFO)
+_HEALTH_BODY = b'{"status":"ok"}'
+
+
+@app.get("/", response_class=Response)
 async def root():
     """Root endpoint with API information"""
-    return {
-        "message": "Workflow Event Processor API",
-        "version": settings.app_version,
-        "docs": "/docs",
-        "health": f"{settings.api_prefix}/v1/health",
-    }
+    return Response(_ROOT_BODY, media_type="application/json")
+
+
+@app.get("/healthz", response_class=Response)
+async def healthz():
+    """Liveness check"""
+    return Response(_HEALTH_BODY, media_type="application/json")
+
+
+# The OpenAPI schema is complete once all routes are registered; generating it here also spares the first /docs hit
+fast_routes = {"/": _ROOT_BODY, "/healthz": _HEALTH_BODY}
+if app.openapi_url:
+    fast_routes[app.openapi_url] = dump_json_bytes(app.openapi())
+
+# Added last so it is outermost: these static responses skip routing and the other middleware, adding the CORS
+# headers themselves. Deploy-static bodies carry an ETag; the health check is never cacheable
+app.add_middleware(
+    FastPathMiddleware,
+    routes=fast_routes,
+    cache_paths=set(fast_routes) - {"/healthz"},
+    allow_origins=settings.cors_origins_set,
+    allow_credentials=cors_allow_credentials,
+)
 
 
 if __name__ == "__main__":
+    # Development server only; production runs multi-process under Gunicorn: gunicorn -c gunicorn_conf.py main:app
     uvicorn.run(
-        "main:app", host=settings.api_host, port=settings.api_port, reload=True, log_level=settings.log_level.lower()
+        "main:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        reload=settings.api_reload,
+        backlog=settings.api_backlog,
+        timeout_keep_alive=settings.api_keep_alive_timeout,
+        limit_concurrency=settings.api_limit_concurrency,
+        log_level=settings.log_level.lower(),
+        loop=EVENT_LOOP,
+        http=HTTP_PROTOCOL,
     )